@@ -1,10 +1,12 @@
-from ._types import TrainArrival
-from .cache import CachedFunction, CacheEntry, cache_with_ttl
+from ._types import ArrivalBoard, TrainArrival
+from .cache import CachedFunction, CacheEntry, ErrorEntry, cache_with_ttl
 
 
 __all__ = [
+    "ArrivalBoard",
     "TrainArrival",
     "cache_with_ttl",
     "CachedFunction",
     "CacheEntry",
+    "ErrorEntry",
 ]
@@ -1,3 +1,7 @@
+import sys
+from array import array
+from collections.abc import Iterable
+from dataclasses import dataclass
 from typing import Literal
 
 from pydantic import BaseModel
@@ -12,6 +16,40 @@ class TrainArrival(BaseModel):
     via: str
 
 
+@dataclass(slots=True)
+class ArrivalBoard:
+    """Arrivals for one board, stored column-wise."""
+
+    times: array[int]
+    destinations: tuple[str, ...]
+    vias: tuple[str, ...]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple[int, str, str]]) -> "ArrivalBoard":
+        times = array("i")
+        destinations = []
+        vias = []
+        for time, destination, via in rows:
+            times.append(time)
+            destinations.append(sys.intern(destination))
+            vias.append(sys.intern(via))
+        return cls(times, tuple(destinations), tuple(vias))
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def fingerprint(self) -> int:
+        return hash((self.times.tobytes(), self.destinations, self.vias))
+
+    def to_models(self) -> list[TrainArrival]:
+        return [
+            TrainArrival(time=time, destination=destination, via=via)
+            for time, destination, via in zip(
+                self.times, self.destinations, self.vias, strict=True
+            )
+        ]
+
+
 class LineStatusResponse(BaseModel):
     status: str
     description: str
@@ -1,10 +1,16 @@
+import asyncio
+import heapq
 import inspect
+import math
 import time
+from collections import deque
 from collections.abc import Callable, Coroutine
 from dataclasses import dataclass
 from functools import update_wrapper
 from threading import Lock
-from typing import ParamSpec, TypeVar
+from typing import NoReturn, ParamSpec, TypeVar, overload
+
+from .tracing import span
 
 
 P = ParamSpec("P")
@@ -16,16 +22,127 @@ T_co = TypeVar("T_co", covariant=True)
 class CacheEntry[T]:
     creation_time: float
     result: T
+    ttl: float
+
+    def is_fresh(self, now: float) -> bool:
+        return self.creation_time + self.ttl > now
+
+
+@dataclass(slots=True)
+class ErrorEntry:
+    """A cached failure, re-raised as a fresh exception until it expires."""
+
+    creation_time: float
+    error_type: type[Exception]
+    args: tuple
+    ttl: float
+
+    @classmethod
+    def from_error(cls, now: float, error: Exception, ttl: float) -> "ErrorEntry":
+        return cls(now, type(error), error.args, ttl)
+
+    def is_fresh(self, now: float) -> bool:
+        return self.creation_time + self.ttl > now
+
+    def reraise(self) -> NoReturn:
+        raise self.error_type(*self.args)
+
+
+class _ErrorEntries:
+    """Cached errors in expiry order, capped at `max_entries`."""
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._order: deque[tuple[tuple, ErrorEntry]] = deque()
+
+    def clear(self) -> None:
+        self._order.clear()
+
+    def add[T](
+        self,
+        cache: dict[tuple, CacheEntry[T] | ErrorEntry],
+        key: tuple,
+        entry: ErrorEntry,
+        now: float,
+    ) -> None:
+        cache[key] = entry
+        self._order.append((key, entry))
+        while self._order and (
+            len(self._order) > self._max_entries or not self._order[0][1].is_fresh(now)
+        ):
+            old_key, old_entry = self._order.popleft()
+            # the key may have been refilled since
+            if cache.get(old_key) is old_entry:
+                del cache[old_key]
+
+
+class DecayingCounter[K, V]:
+    """Access counts that halve every `half_life` seconds, for finding popular keys."""
+
+    def __init__(self, half_life: float, max_keys: int = 10_000) -> None:
+        self._decay_rate = math.log(2) / half_life
+        self._max_keys = max_keys
+        # key -> (score, time of last update, payload)
+        self._counts: dict[K, tuple[float, float, V]] = {}
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def _decayed(self, key: K, now: float) -> float:
+        score, updated, _ = self._counts[key]
+        return score * math.exp(-self._decay_rate * (now - updated))
+
+    def add(self, key: K, payload: V, now: float) -> None:
+        score = self._decayed(key, now) if key in self._counts else 0.0
+        self._counts[key] = (score + 1, now, payload)
+        if len(self._counts) > self._max_keys:
+            # drop the cold half rather than pruning on every insert
+            keep = self.top(self._max_keys // 2, now)
+            self._counts = {key: (score, now, payload) for key, payload, score in keep}
+
+    def clear(self) -> None:
+        self._counts.clear()
+
+    def payload(self, key: K) -> V | None:
+        entry = self._counts.get(key)
+        return entry[2] if entry else None
+
+    def discard(self, key: K) -> None:
+        self._counts.pop(key, None)
+
+    def top(
+        self, k: int, now: float, min_score: float = 0.0
+    ) -> list[tuple[K, V, float]]:
+        """The `k` highest scoring keys scoring at least `min_score`."""
+        scored = (
+            (key, payload, self._decayed(key, now))
+            for key, (_, _, payload) in self._counts.items()
+        )
+        return heapq.nlargest(
+            k,
+            (item for item in scored if item[2] >= min_score),
+            key=lambda item: item[2],
+        )
 
 
 class CachedFunction[**P, T_co]:
     __name__: str
 
-    def __init__(self, f: Callable[P, T_co], ttl: float) -> None:
+    def __init__(
+        self,
+        f: Callable[P, T_co],
+        ttl: float | Callable[[T_co], float],
+        cache_errors: tuple[type[Exception], ...] = (),
+        error_ttl: float = 0,
+        max_errors: int = 1024,
+    ) -> None:
         self._f = f
         self._ttl = ttl
+        self._cache_errors = cache_errors
+        self._error_ttl = error_ttl
+        self._errors = _ErrorEntries(max_errors)
         self._sig = inspect.signature(f)
-        self._cache: dict[tuple, CacheEntry[T_co]] = {}
+        self._cache: dict[tuple, CacheEntry[T_co] | ErrorEntry] = {}
         self._lock = Lock()
 
         update_wrapper(self, f)
@@ -33,6 +150,15 @@ class CachedFunction[**P, T_co]:
     def clear_cache(self) -> None:
         with self._lock:
             self._cache.clear()
+            self._errors.clear()
+
+    def ttls(self) -> dict[tuple, float]:
+        """TTL each cached key was stored with, for tuning adaptive TTLs."""
+        with self._lock:
+            return {key: entry.ttl for key, entry in self._cache.items()}
+
+    def _ttl_for(self, result: T_co) -> float:
+        return self._ttl(result) if callable(self._ttl) else self._ttl
 
     def __call__(self, *args: P.args, **kwargs: P.kwargs) -> T_co:
         now = time.monotonic()
@@ -53,28 +179,57 @@ class CachedFunction[**P, T_co]:
 
         with self._lock:
             entry = self._cache.get(hashed)
-            if entry and entry.creation_time + self._ttl > now:
+            if entry and entry.is_fresh(now):
+                if isinstance(entry, ErrorEntry):
+                    entry.reraise()
                 return entry.result
 
-        result = self._f(*args, **kwargs)
+        try:
+            result = self._f(*args, **kwargs)
+        except self._cache_errors as e:
+            with self._lock:
+                self._errors.add(
+                    self._cache,
+                    hashed,
+                    ErrorEntry.from_error(now, e, self._error_ttl),
+                    now,
+                )
+            raise
 
         with self._lock:
             entry = self._cache.get(hashed)
-            if entry and entry.creation_time + self._ttl > now:
+            if entry and entry.is_fresh(now) and isinstance(entry, CacheEntry):
                 return entry.result
-            self._cache[hashed] = CacheEntry(now, result)
+            self._cache[hashed] = CacheEntry(now, result, self._ttl_for(result))
 
         return result
 
 
 class CachedAsyncFunction[**P, T_co]:
+    """Async TTL cache where concurrent misses for a key share one call."""
+
     __name__: str
 
-    def __init__(self, f: Callable[P, Coroutine[None, None, T_co]], ttl: float) -> None:
+    def __init__(
+        self,
+        f: Callable[P, Coroutine[None, None, T_co]],
+        ttl: float | Callable[[T_co], float],
+        cache_errors: tuple[type[Exception], ...] = (),
+        error_ttl: float = 0,
+        max_errors: int = 1024,
+        popularity_half_life: float = 900,
+    ) -> None:
         self._f = f
         self._ttl = ttl
+        self._cache_errors = cache_errors
+        self._error_ttl = error_ttl
+        self._errors = _ErrorEntries(max_errors)
         self._sig = inspect.signature(f)
-        self._cache: dict[tuple, CacheEntry[T_co]] = {}
+        self._cache: dict[tuple, CacheEntry[T_co] | ErrorEntry] = {}
+        self._popularity: DecayingCounter[tuple, inspect.BoundArguments] = (
+            DecayingCounter(popularity_half_life)
+        )
+        self._in_flight: dict[tuple, asyncio.Task[T_co]] = {}
         self._lock = Lock()
 
         update_wrapper(self, f)
@@ -83,10 +238,30 @@ class CachedAsyncFunction[**P, T_co]:
     def clear_cache(self) -> None:
         with self._lock:
             self._cache.clear()
+            self._errors.clear()
+            self._popularity.clear()
 
-    async def __call__(self, *args: P.args, **kwargs: P.kwargs) -> T_co:
-        now = time.monotonic()
+    def ttls(self) -> dict[tuple, float]:
+        """TTL each cached key was stored with, for tuning adaptive TTLs."""
+        with self._lock:
+            return {key: entry.ttl for key, entry in self._cache.items()}
+
+    def _ttl_for(self, result: T_co) -> float:
+        return self._ttl(result) if callable(self._ttl) else self._ttl
 
+    def popular(self, k: int, min_score: float = 0.0) -> list[tuple[tuple, float]]:
+        """The `k` most requested keys scoring at least `min_score`, bar failed ones."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, score)
+                for key, _, score in self._popularity.top(k, now, min_score)
+                if not isinstance(self._cache.get(key), ErrorEntry)
+            ]
+
+    def _bind(
+        self, *args: P.args, **kwargs: P.kwargs
+    ) -> tuple[tuple, inspect.BoundArguments]:
         bound = self._sig.bind(*args, **kwargs)
         bound.apply_defaults()
         hashed = tuple(
@@ -100,38 +275,156 @@ class CachedAsyncFunction[**P, T_co]:
             )
             for name in self._sig.parameters
         )
+        return hashed, bound
 
-        with self._lock:
-            entry = self._cache.get(hashed)
-            if entry and entry.creation_time + self._ttl > now:
-                return entry.result
-
-        result = await self._f(*args, **kwargs)
+    def key(self, *args: P.args, **kwargs: P.kwargs) -> tuple:
+        """The cache key a call with these arguments is stored under."""
+        return self._bind(*args, **kwargs)[0]
 
+    def remaining_ttl(self, key: tuple, result: T_co | None = None) -> float:
+        """Seconds until `key` expires; 0 if `result` is given and no longer cached."""
+        now = time.monotonic()
         with self._lock:
-            entry = self._cache.get(hashed)
-            if entry and entry.creation_time + self._ttl > now:
-                return entry.result
-            self._cache[hashed] = CacheEntry(now, result)
-
+            entry = self._cache.get(key)
+        if not isinstance(entry, CacheEntry) or (
+            result is not None and entry.result is not result
+        ):
+            return 0.0
+        return max(0.0, entry.creation_time + entry.ttl - now)
+
+    def _fill(self, key: tuple, bound: inspect.BoundArguments) -> asyncio.Task[T_co]:
+        """The in-flight call computing `key`, started if needed; hold the lock."""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute(key, bound))
+            self._in_flight[key] = task
+        return task
+
+    async def _compute(self, key: tuple, bound: inspect.BoundArguments) -> T_co:
+        now = time.monotonic()
+        try:
+            result = await self._f(*bound.args, **bound.kwargs)
+        except self._cache_errors as e:
+            with self._lock:
+                self._errors.add(
+                    self._cache, key, ErrorEntry.from_error(now, e, self._error_ttl), now
+                )
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        with self._lock:
+            self._cache[key] = CacheEntry(now, result, self._ttl_for(result))
         return result
 
+    async def refresh(self, key: tuple) -> None:
+        """Recompute `key` from its last call's arguments without counting an access."""
+        with self._lock:
+            bound = self._popularity.payload(key)
+            if bound is None:
+                return
+            task = self._fill(key, bound)
+
+        try:
+            await asyncio.shield(task)
+        except self._cache_errors:
+            with self._lock:
+                # not worth refreshing again until someone asks for it
+                self._popularity.discard(key)
 
+    async def __call__(self, *args: P.args, **kwargs: P.kwargs) -> T_co:
+        now = time.monotonic()
+
+        hashed, bound = self._bind(*args, **kwargs)
+
+        with span("cache.lookup", function=self.__name__) as s:
+            with self._lock:
+                self._popularity.add(hashed, bound, now)
+                entry = self._cache.get(hashed)
+                if entry and entry.is_fresh(now):
+                    if isinstance(entry, ErrorEntry):
+                        s.set_attribute("cache.result", "negative_hit")
+                        entry.reraise()
+                    s.set_attribute("cache.result", "hit")
+                    return entry.result
+                coalesced = hashed in self._in_flight
+                task = self._fill(hashed, bound)
+
+            try:
+                result = await asyncio.shield(task)
+            except self._cache_errors:
+                s.set_attribute(
+                    "cache.result", "coalesced" if coalesced else "negative_miss"
+                )
+                raise
+            # joined another caller's request instead of making our own
+            s.set_attribute("cache.result", "coalesced" if coalesced else "miss")
+            return result
+
+
+@overload
 def cache_with_ttl(
-    *, ttl: float
-) -> Callable[[Callable[P, T_co]], CachedFunction[P, T_co]]:
-    def decorator(f: Callable[P, T_co]) -> CachedFunction[P, T_co]:
-        return CachedFunction(f, ttl)
+    *,
+    ttl: float,
+    cache_errors: tuple[type[Exception], ...] = (),
+    error_ttl: float = 0,
+) -> Callable[[Callable[P, T_co]], CachedFunction[P, T_co]]: ...
+
+
+@overload
+def cache_with_ttl[**Q, R](
+    *,
+    ttl: Callable[[R], float],
+    cache_errors: tuple[type[Exception], ...] = (),
+    error_ttl: float = 0,
+) -> Callable[[Callable[Q, R]], CachedFunction[Q, R]]: ...
+
+
+def cache_with_ttl[**Q, R](
+    *,
+    ttl: float | Callable[[R], float],
+    cache_errors: tuple[type[Exception], ...] = (),
+    error_ttl: float = 0,
+) -> Callable[[Callable[Q, R]], CachedFunction[Q, R]]:
+    """Cache results for `ttl` seconds, or `ttl(result)` seconds if callable."""
+
+    def decorator(f: Callable[Q, R]) -> CachedFunction[Q, R]:
+        return CachedFunction(f, ttl, cache_errors, error_ttl)
 
     return decorator
 
 
+@overload
 def aio_cache_with_ttl(
-    *, ttl: float
-) -> Callable[[Callable[P, Coroutine[None, None, T_co]]], CachedAsyncFunction[P, T_co]]:
+    *,
+    ttl: float,
+    cache_errors: tuple[type[Exception], ...] = (),
+    error_ttl: float = 0,
+) -> Callable[
+    [Callable[P, Coroutine[None, None, T_co]]], CachedAsyncFunction[P, T_co]
+]: ...
+
+
+@overload
+def aio_cache_with_ttl[**Q, R](
+    *,
+    ttl: Callable[[R], float],
+    cache_errors: tuple[type[Exception], ...] = (),
+    error_ttl: float = 0,
+) -> Callable[[Callable[Q, Coroutine[None, None, R]]], CachedAsyncFunction[Q, R]]: ...
+
+
+def aio_cache_with_ttl[**Q, R](
+    *,
+    ttl: float | Callable[[R], float],
+    cache_errors: tuple[type[Exception], ...] = (),
+    error_ttl: float = 0,
+) -> Callable[[Callable[Q, Coroutine[None, None, R]]], CachedAsyncFunction[Q, R]]:
+    """Cache results for `ttl` seconds, or `ttl(result)` seconds if callable."""
+
     def decorator(
-        f: Callable[P, Coroutine[None, None, T_co]],
-    ) -> CachedAsyncFunction[P, T_co]:
-        return CachedAsyncFunction(f, ttl)
+        f: Callable[Q, Coroutine[None, None, R]],
+    ) -> CachedAsyncFunction[Q, R]:
+        return CachedAsyncFunction(f, ttl, cache_errors, error_ttl)
 
     return decorator
@@ -0,0 +1,105 @@
+import asyncio
+from collections.abc import Sequence
+from typing import Any
+
+from uvicorn.config import Config
+from uvicorn.protocols.websockets.websockets_sansio_impl import (
+    WebSocketsSansIOProtocol,
+)
+from uvicorn.server import ServerState
+from websockets.extensions.base import (
+    Extension,
+    ExtensionParameter,
+    ServerExtensionFactory,
+)
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+from websockets.frames import OP_BINARY, OP_TEXT, Frame
+from websockets.typing import ExtensionName
+
+from .settings import (
+    WS_DEFLATE_CONTEXT_TAKEOVER,
+    WS_DEFLATE_MEM_LEVEL,
+    WS_DEFLATE_MIN_SIZE,
+    WS_DEFLATE_WINDOW_BITS,
+)
+
+
+class MinSizeDeflate(Extension):
+    """permessage-deflate that leaves messages under `min_size` bytes uncompressed."""
+
+    name = ExtensionName("permessage-deflate")
+
+    def __init__(self, inner: Extension, min_size: int) -> None:
+        self._inner = inner
+        self._min_size = min_size
+
+    def decode(self, frame: Frame, *, max_size: int | None = None) -> Frame:
+        return self._inner.decode(frame, max_size=max_size)
+
+    def encode(self, frame: Frame) -> Frame:
+        if (
+            frame.opcode in (OP_TEXT, OP_BINARY)
+            and frame.fin
+            and len(frame.data) < self._min_size
+        ):
+            return frame
+        return self._inner.encode(frame)
+
+
+class MinSizeDeflateFactory(ServerExtensionFactory):
+    name = ExtensionName("permessage-deflate")
+
+    def __init__(
+        self,
+        min_size: int,
+        *,
+        window_bits: int,
+        mem_level: int,
+        context_takeover: bool,
+    ) -> None:
+        self.min_size = min_size
+        self._inner = ServerPerMessageDeflateFactory(
+            server_no_context_takeover=not context_takeover,
+            server_max_window_bits=window_bits,
+            compress_settings={"memLevel": mem_level},
+        )
+
+    def process_request_params(
+        self,
+        params: Sequence[ExtensionParameter],
+        accepted_extensions: Sequence[Extension],
+    ) -> tuple[list[ExtensionParameter], Extension]:
+        response, extension = self._inner.process_request_params(
+            params, accepted_extensions
+        )
+        return response, MinSizeDeflate(extension, self.min_size)
+
+
+def deflate_factory(
+    *,
+    window_bits: int = WS_DEFLATE_WINDOW_BITS,
+    mem_level: int = WS_DEFLATE_MEM_LEVEL,
+    min_size: int = WS_DEFLATE_MIN_SIZE,
+    context_takeover: bool = WS_DEFLATE_CONTEXT_TAKEOVER,
+) -> MinSizeDeflateFactory:
+    return MinSizeDeflateFactory(
+        min_size,
+        window_bits=window_bits,
+        mem_level=mem_level,
+        context_takeover=context_takeover,
+    )
+
+
+class DeflateWebSocketProtocol(WebSocketsSansIOProtocol):
+    """uvicorn's sans-I/O websockets protocol with our tuned permessage-deflate."""
+
+    def __init__(
+        self,
+        config: Config,
+        server_state: ServerState,
+        app_state: dict[str, Any],
+        _loop: asyncio.AbstractEventLoop | None = None,
+    ) -> None:
+        super().__init__(config, server_state, app_state, _loop)
+        if config.ws_per_message_deflate:
+            self.conn.available_extensions = [deflate_factory()]
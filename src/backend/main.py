@@ -1,22 +1,58 @@
 import asyncio
 import logging
-from collections.abc import AsyncIterator
+import secrets
+import threading
+from collections.abc import AsyncIterator, Callable
 from contextlib import asynccontextmanager
+from typing import Annotated
 
-import httpx
-from fastapi import FastAPI, WebSocket
-from fastapi.responses import FileResponse, Response
+from fastapi import (
+    APIRouter,
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    WebSocket,
+)
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
+from starlette.status import WS_1008_POLICY_VIOLATION
 from starlette.websockets import WebSocketDisconnect
 
 from ._types import Direction
 from .logging import LOGGING_CONFIG
+from .prefetch import Prefetcher
+from .profiling import Profiler, SlowCallbackDetector
+from .serialise import (
+    arrivals_frame,
+    arrivals_json,
+    body,
+    frame,
+    status_frame,
+    status_json,
+)
 from .settings import (
+    ADMIN_TOKEN,
     BACKEND_PORT,
     CV_PATH,
     CV_SYNC_INTERVAL,
     CV_URL,
+    PREFETCH_INTERVAL,
+    PREFETCH_MIN_SCORE,
+    PREFETCH_RATE,
+    PREFETCH_TOP_K,
+    SLOW_CALLBACK_THRESHOLD,
+    TRACE_PATH,
+    TRACE_SAMPLE_RATE,
 )
-from .tfl import get_arrivals, get_line_status
+from .tfl import (
+    Fetched,
+    TFLNotFoundError,
+    fetch_arrivals,
+    fetch_line_status,
+)
+from .tracing import configure_tracing, flush_tracing, span
 
 
 logger = logging.getLogger(__name__)
@@ -24,6 +60,8 @@ logger = logging.getLogger(__name__)
 
 async def _sync_cv() -> None:
     """Download the CV PDF from GitHub on a loop."""
+    import httpx
+
     async with httpx.AsyncClient() as client:
         while True:
             try:
@@ -38,12 +76,96 @@ async def _sync_cv() -> None:
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
-    task = asyncio.create_task(_sync_cv())
+    configure_tracing(TRACE_PATH, sample_rate=TRACE_SAMPLE_RATE)
+    detector = SlowCallbackDetector(SLOW_CALLBACK_THRESHOLD)
+    if SLOW_CALLBACK_THRESHOLD > 0:
+        detector.start()
+    tasks = [asyncio.create_task(_sync_cv())]
+    if PREFETCH_TOP_K > 0:
+        prefetcher = Prefetcher(
+            [fetch_arrivals, fetch_line_status],
+            top_k=PREFETCH_TOP_K,
+            interval=PREFETCH_INTERVAL,
+            rate=PREFETCH_RATE,
+            min_score=PREFETCH_MIN_SCORE,
+        )
+        tasks.append(asyncio.create_task(prefetcher.run()))
     yield
-    task.cancel()
+    for task in tasks:
+        task.cancel()
+    detector.stop()
+    flush_tracing()
+
+
+def _require_admin(
+    x_admin_token: Annotated[str | None, Header()] = None,
+) -> None:
+    if (
+        ADMIN_TOKEN is None
+        or x_admin_token is None
+        or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN)
+    ):
+        raise HTTPException(status_code=403)
+
+
+admin = APIRouter(prefix="/api/admin", dependencies=[Depends(_require_admin)])
+_profiler: Profiler | None = None
+
+
+@admin.post("/profiler/start")
+async def start_profiler(
+    interval: Annotated[float, Query(gt=0)] = 0.005,
+) -> dict[str, str]:
+    global _profiler
+    if _profiler is not None and _profiler.running:
+        raise HTTPException(status_code=409, detail="Profiler already running")
+    # async so this runs on, and samples, the event loop thread
+    _profiler = Profiler(threading.get_ident(), interval)
+    _profiler.start()
+    return {"status": "started"}
+
+
+@admin.post("/profiler/stop", response_class=PlainTextResponse)
+async def stop_profiler() -> str:
+    if _profiler is None or not _profiler.running:
+        raise HTTPException(status_code=409, detail="Profiler not running")
+    return _profiler.stop()
+
+
+@admin.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: Annotated[float, Query(gt=0, le=60)] = 10,
+    interval: Annotated[float, Query(gt=0)] = 0.005,
+) -> str:
+    """Sample the event loop for `seconds` and return collapsed stacks."""
+    await start_profiler(interval)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        # also on cancellation, or the sampler would run until restart
+        output = await stop_profiler()
+    return output
+
+
+@admin.get("/cache/ttls")
+def get_cache_ttls() -> dict[str, dict[str, float]]:
+    """Per-key TTLs chosen by the adaptive caches, for tuning."""
+    return {
+        f.__name__: {
+            ", ".join(f"{name}={value}" for name, value in key): ttl
+            for key, ttl in f.ttls().items()
+        }
+        for f in (fetch_arrivals, fetch_line_status)
+    }
 
 
 app = FastAPI(lifespan=lifespan)
+app.include_router(admin)
+
+
+@app.exception_handler(TFLNotFoundError)
+def not_found_handler(_request: Request, exc: TFLNotFoundError) -> JSONResponse:
+    return JSONResponse({"detail": str(exc)}, status_code=404)
 
 
 @app.get("/health")
@@ -61,6 +183,45 @@ def get_cv() -> FileResponse | Response:
     )
 
 
+def _snapshot[T](
+    request: Request,
+    fetched: Fetched[T],
+    remaining_ttl: float,
+    serialise: Callable[[T], bytes],
+) -> Response:
+    """Serve a cached result with an ETag and a max-age matching its remaining TTL."""
+    content, etag = body(fetched, serialise)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={int(remaining_ttl)}"}
+    if_none_match = {
+        tag.strip().removeprefix("W/")
+        for tag in request.headers.get("if-none-match", "").split(",")
+    }
+    if "*" in if_none_match or etag in if_none_match:
+        return Response(status_code=304, headers=headers)
+    return Response(content, media_type="application/json", headers=headers)
+
+
+@app.get("/api/arrivals/{station}/{line}")
+@app.get("/api/arrivals/{station}/{line}/{direction}")
+async def http_get_arrivals(
+    request: Request, station: str, line: str, direction: Direction | None = None
+) -> Response:
+    fetched = await fetch_arrivals(station, line, direction)
+    key = fetch_arrivals.key(station, line, direction)
+    return _snapshot(
+        request, fetched, fetch_arrivals.remaining_ttl(key, fetched), arrivals_json
+    )
+
+
+@app.get("/api/status/{line}")
+async def http_get_status(request: Request, line: str) -> Response:
+    fetched = await fetch_line_status(line)
+    key = fetch_line_status.key(line)
+    return _snapshot(
+        request, fetched, fetch_line_status.remaining_ttl(key, fetched), status_json
+    )
+
+
 @app.websocket("/ws/arrivals/{station}/{line}")
 @app.websocket("/ws/arrivals/{station}/{line}/{direction}")
 async def ws_get_arrivals(
@@ -70,10 +231,17 @@ async def ws_get_arrivals(
     logger.info("Opened connection")
     try:
         while True:
-            raw_data = await get_arrivals(station, line, direction)
-            data = [model.model_dump_json() for model in raw_data]
-            await websocket.send_text("\n".join(data))
+            with span(
+                "ws.arrivals.tick", station=station, line=line, direction=str(direction)
+            ):
+                data = frame(
+                    await fetch_arrivals(station, line, direction), arrivals_frame
+                )
+                with span("ws.send", bytes=len(data)):
+                    await websocket.send_text(data)
             await asyncio.sleep(2)
+    except TFLNotFoundError as e:
+        await websocket.close(code=WS_1008_POLICY_VIOLATION, reason=str(e))
     except WebSocketDisconnect:
         logger.info("Closed connection")
 
@@ -87,9 +255,13 @@ async def ws_get_status(
     logger.info("Opened connection")
     try:
         while True:
-            raw_data = await get_line_status(line)
-            await websocket.send_text(raw_data.model_dump_json())
+            with span("ws.status.tick", line=line):
+                data = frame(await fetch_line_status(line), status_frame)
+                with span("ws.send", bytes=len(data)):
+                    await websocket.send_text(data)
             await asyncio.sleep(2)
+    except TFLNotFoundError as e:
+        await websocket.close(code=WS_1008_POLICY_VIOLATION, reason=str(e))
     except WebSocketDisconnect:
         logger.info("Closed connection")
 
@@ -97,10 +269,13 @@ async def ws_get_status(
 if __name__ == "__main__":
     import uvicorn
 
+    from .compression import DeflateWebSocketProtocol
+
     uvicorn.run(
         "src.backend.main:app",
         port=BACKEND_PORT,
         reload=True,
         host="0.0.0.0",
         log_config=LOGGING_CONFIG,
+        ws=DeflateWebSocketProtocol,
     )
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from collections.abc import Sequence
+
+from .cache import CachedAsyncFunction
+
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Refresh the most requested keys before they expire, within a rate budget."""
+
+    def __init__(
+        self,
+        functions: Sequence[CachedAsyncFunction],
+        *,
+        top_k: int,
+        interval: float,
+        rate: float,
+        min_score: float,
+    ) -> None:
+        self._functions = functions
+        self._top_k = top_k
+        self._min_score = min_score
+        self._interval = interval
+        self._budget = max(1, int(rate * interval))
+
+    def due(self) -> list[tuple[CachedAsyncFunction, tuple]]:
+        """Popular keys that will be cold by the next pass, hottest first."""
+        candidates = [
+            (score, i, f, key)
+            for i, f in enumerate(self._functions)
+            for key, score in f.popular(self._top_k, self._min_score)
+            if f.remaining_ttl(key) <= self._interval
+        ]
+        candidates.sort(key=lambda c: (-c[0], c[1]))
+        return [(f, key) for _, _, f, key in candidates[: self._budget]]
+
+    async def tick(self) -> int:
+        refreshed = 0
+        for f, key in self.due():
+            try:
+                await f.refresh(key)
+                refreshed += 1
+            except Exception:
+                logger.exception("Failed to prefetch %s%s", f.__name__, key)
+        return refreshed
+
+    async def run(self) -> None:
+        while True:
+            await self.tick()
+            await asyncio.sleep(self._interval)
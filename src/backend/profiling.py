@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from types import FrameType
+
+
+logger = logging.getLogger(__name__)
+
+
+def _collapse(frame: FrameType | None) -> str:
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{frame.f_code.co_qualname}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """Stack-sampling profiler for a single thread."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005) -> None:
+        self._thread_id = thread_id
+        self._interval = interval
+        self._samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            raise RuntimeError("profiler already running")
+        self._samples.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and return the collapsed stacks, hottest first."""
+        if self._thread is None:
+            raise RuntimeError("profiler not running")
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self._samples.most_common()
+        )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._samples[_collapse(frame)] += 1
+
+
+class SlowCallbackDetector:
+    """Log the loop thread's stack whenever the event loop is blocked too long."""
+
+    def __init__(self, threshold: float) -> None:
+        self._threshold = threshold
+        self._last_beat = time.monotonic()
+        self._stop = threading.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start detecting; must be called from the event loop thread."""
+        self._stop.clear()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(
+            target=self._watch,
+            args=(threading.get_ident(),),
+            name="slow-callback-detector",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    async def _beat(self) -> None:
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self._threshold / 4)
+
+    def _watch(self, thread_id: int) -> None:
+        reported = None
+        while not self._stop.wait(self._threshold / 4):
+            last_beat = self._last_beat
+            blocked = time.monotonic() - last_beat
+            # allow for the heartbeat's own sleep before calling it a stall
+            if blocked < self._threshold * 1.25 or reported == last_beat:
+                continue
+            reported = last_beat
+            frame = sys._current_frames().get(thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            logger.warning(
+                "Event loop blocked for %.3fs so far, currently in:\n%s", blocked, stack
+            )
@@ -0,0 +1,66 @@
+import hashlib
+from collections.abc import Callable
+from dataclasses import dataclass
+from weakref import WeakKeyDictionary
+
+from pydantic import TypeAdapter
+
+from ._types import ArrivalBoard, LineStatusResponse, TrainArrival
+from .tfl import Fetched
+from .tracing import span
+
+
+_ARRIVALS_JSON = TypeAdapter(list[TrainArrival])
+
+
+@dataclass(slots=True)
+class _Serialised:
+    body: bytes | None = None
+    etag: str | None = None
+    frame: str | None = None
+
+
+# dropped together with the cache entry holding the result
+_SERIALISED: WeakKeyDictionary[Fetched, _Serialised] = WeakKeyDictionary()
+
+
+def _serialised(fetched: Fetched) -> _Serialised:
+    if (serialised := _SERIALISED.get(fetched)) is None:
+        serialised = _SERIALISED[fetched] = _Serialised()
+    return serialised
+
+
+def frame[T](fetched: Fetched[T], serialise: Callable[[T], str]) -> str:
+    """Websocket frame for a cached result, serialised once for all its sockets."""
+    serialised = _serialised(fetched)
+    if serialised.frame is None:
+        with span("serialise"):
+            serialised.frame = serialise(fetched.value)
+    return serialised.frame
+
+
+def body[T](fetched: Fetched[T], serialise: Callable[[T], bytes]) -> tuple[bytes, str]:
+    """HTTP body and ETag for a cached result, serialised once for all requests."""
+    serialised = _serialised(fetched)
+    if serialised.body is None or serialised.etag is None:
+        with span("serialise"):
+            serialised.body = serialise(fetched.value)
+        digest = hashlib.blake2b(serialised.body, digest_size=8).hexdigest()
+        serialised.etag = f'"{digest}"'
+    return serialised.body, serialised.etag
+
+
+def arrivals_frame(board: ArrivalBoard) -> str:
+    return "\n".join(model.model_dump_json() for model in board.to_models())
+
+
+def status_frame(status: LineStatusResponse) -> str:
+    return status.model_dump_json()
+
+
+def arrivals_json(board: ArrivalBoard) -> bytes:
+    return _ARRIVALS_JSON.dump_json(board.to_models())
+
+
+def status_json(status: LineStatusResponse) -> bytes:
+    return status.model_dump_json().encode()
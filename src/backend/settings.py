@@ -10,3 +10,28 @@ CV_URL = (
 )
 CV_PATH = Path(os.getenv("CV_PATH", "/tmp/Saul_Cooperman_CV.pdf"))
 CV_SYNC_INTERVAL = int(os.getenv("CV_SYNC_INTERVAL", "300"))
+
+# OTLP/JSON span output; tracing is disabled when unset
+TRACE_PATH = Path(p) if (p := os.getenv("TRACE_PATH")) else None
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+# Token for /api/admin endpoints; they are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Log event loop stalls longer than this many seconds; 0 disables the detector
+SLOW_CALLBACK_THRESHOLD = float(os.getenv("SLOW_CALLBACK_THRESHOLD", "0.1"))
+
+# permessage-deflate tuning for websocket frames. Per-connection compressor memory is
+# roughly 2**(window_bits + 2) + 2**(mem_level + 9) bytes.
+WS_DEFLATE_WINDOW_BITS = int(os.getenv("WS_DEFLATE_WINDOW_BITS", "12"))
+WS_DEFLATE_MEM_LEVEL = int(os.getenv("WS_DEFLATE_MEM_LEVEL", "5"))
+WS_DEFLATE_MIN_SIZE = int(os.getenv("WS_DEFLATE_MIN_SIZE", "128"))
+WS_DEFLATE_CONTEXT_TAKEOVER = os.getenv("WS_DEFLATE_CONTEXT_TAKEOVER", "1") != "0"
+
+# Keep the most requested boards warm; PREFETCH_TOP_K=0 disables prefetching
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "50"))
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "1.0"))
+# upstream refreshes per second the prefetcher may spend
+PREFETCH_RATE = float(os.getenv("PREFETCH_RATE", "5"))
+# decayed request count below which a board is no longer prefetched; requests are
+# counted with a 15 minute half-life, so one-off requests never qualify
+PREFETCH_MIN_SCORE = float(os.getenv("PREFETCH_MIN_SCORE", "1.5"))
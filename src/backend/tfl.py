@@ -1,22 +1,31 @@
+import asyncio
 import json
 import os
-from typing import Any
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from functools import cache
+from typing import Any, Protocol
 
-import requests
-from dotenv import load_dotenv
 from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
-from ._types import Direction, LineStatusResponse, TrainArrival
+from ._types import ArrivalBoard, Direction, LineStatusResponse
 from .cache import aio_cache_with_ttl
+from .tracing import span
 
 
-load_dotenv()
+@cache
+def _headers() -> dict[str, str | None]:
+    """TfL request headers, loading `.env` on first use."""
+    from dotenv import load_dotenv
 
-
-_HEADERS = {
-    "Cache-Control": "no-cache",
-    "app_key": os.getenv("TFL_PRIVATE"),
-}
+    load_dotenv()
+    return {
+        "Cache-Control": "no-cache",
+        "app_key": os.getenv("TFL_PRIVATE"),
+    }
 
 
 class _TFLTiming(BaseModel):
@@ -71,38 +80,214 @@ class TFLStatus(BaseModel):
     status_level: int = Field(alias="statusLevel")
 
 
+class TFLError(Exception):
+    """TfL returned an unexpected response."""
+
+
+class TFLNotFoundError(TFLError):
+    """A station or line name did not resolve to exactly one TfL entity."""
+
+    def __init__(self, kind: str, name: str) -> None:
+        # args must rebuild the error, which is how the cache re-raises it
+        super().__init__(kind, name)
+        self.kind = kind
+        self.name = name
+
+    def __str__(self) -> str:
+        return f"Unknown {self.kind}: {self.name!r}"
+
+
 TFL_ENDPOINT = "https://api.tfl.gov.uk"
 
+# Unknown names cannot start resolving between ticks, so remember the failure
+# instead of asking TfL again for every tick of every socket.
+_NOT_FOUND_TTL = 60
+
+# Built once at import rather than on every fetch.
+_ARRIVALS_ADAPTER = TypeAdapter(list[_TFLArrival])
+
+
+class UpstreamResponse(Protocol):
+    """The parts of an HTTP response the client reads; `requests.Response` fits."""
+
+    @property
+    def status_code(self) -> int: ...
+
+    @property
+    def url(self) -> str: ...
+
+    @property
+    def text(self) -> str: ...
+
+    @property
+    def headers(self) -> Mapping[str, str]: ...
+
+
+Transport = Callable[[str, Mapping[str, str] | None], UpstreamResponse]
+
+
+def default_transport(url: str, params: Mapping[str, str] | None) -> UpstreamResponse:
+    """GET `url` from TfL with `requests` and the configured app key."""
+    # `requests` is imported lazily so it is only paid for on the first upstream call
+    import requests
+
+    return requests.get(url, params=params, headers=_headers())
+
+
+_transport: Transport = default_transport
+
+
+def set_transport(transport: Transport | None) -> None:
+    """Route upstream calls through `transport`; `None` restores the default."""
+    global _transport
+    _transport = transport or default_transport
+
 
-def healthcheck() -> TFLStatus:
+async def _get(path: str, params: dict[str, str] | None = None) -> UpstreamResponse:
+    with span("tfl.http", path=path) as s:
+        # the transport blocks, so keep it off the event loop
+        r = await asyncio.to_thread(_transport, f"{TFL_ENDPOINT}{path}", params)
+        s.set_attribute("http.status_code", r.status_code)
+    return r
+
+
+# identity hashed and weakly referenceable so callers can attach state to a result
+@dataclass(slots=True, eq=False, weakref_slot=True)
+class Fetched[T]:
+    """A fetched value with the TTL chosen for it."""
+
+    value: T
+    ttl: float
+
+
+def _fetched_ttl[T](fetched: Fetched[T]) -> float:
+    return fetched.ttl
+
+
+def _header_ttl(headers: Mapping[str, str]) -> float | None:
+    """Remaining freshness advertised by `Cache-Control`/`Age`/`Expires`, if any."""
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        name, _, value = directive.partition("=")
+        directives[name.strip().lower()] = value.strip()
+    if "no-store" in directives or "no-cache" in directives:
+        return 0.0
+
+    # we serve many clients from one cache, so the shared-cache limit wins
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                return max(0.0, float(directives[name]) - float(headers.get("Age", 0)))
+            except ValueError:
+                # an unreadable lifetime or age: treat the response as stale
+                return 0.0
+
+    if "Expires" in headers:
+        try:
+            expires = _http_date(headers["Expires"])
+            date = _http_date(headers["Date"])
+            return max(0.0, (expires - date).total_seconds())
+        except (KeyError, TypeError, ValueError):
+            return 0.0
+    return None
+
+
+def _http_date(value: str) -> datetime:
+    parsed = parsedate_to_datetime(value)
+    # `-0000` dates parse naive; they are still UTC
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=UTC)
+
+
+class _ChangeRate:
+    """Picks TTLs from how often each upstream resource changes."""
+
+    def __init__(
+        self,
+        min_ttl: float,
+        max_ttl: float,
+        smoothing: float = 0.3,
+        *,
+        back_off_when_quiet: bool = True,
+    ) -> None:
+        self._min_ttl = min_ttl
+        self._max_ttl = max_ttl
+        self._smoothing = smoothing
+        self._back_off_when_quiet = back_off_when_quiet
+        # key -> (fingerprint, last change, smoothed change interval)
+        self._seen: dict[str, tuple[int, float, float | None]] = {}
+
+    def ttl(self, key: str, fingerprint: int, header_ttl: float | None) -> float:
+        now = time.monotonic()
+        interval = None
+        changed = now
+        if (seen := self._seen.get(key)) is not None:
+            last_fingerprint, changed, interval = seen
+            if fingerprint != last_fingerprint:
+                sample = now - changed
+                interval = (
+                    sample
+                    if interval is None
+                    else self._smoothing * sample + (1 - self._smoothing) * interval
+                )
+                changed = now
+        self._seen[key] = (fingerprint, changed, interval)
+
+        if self._back_off_when_quiet:
+            ttl = max(interval or 0.0, now - changed) / 2
+        elif header_ttl is None:
+            return self._min_ttl
+        else:
+            ttl = (interval or 0.0) / 2
+        if header_ttl is not None:
+            ttl = min(ttl, header_ttl)
+        return min(max(ttl, self._min_ttl), self._max_ttl)
+
+
+_ARRIVALS_CHANGE_RATE = _ChangeRate(min_ttl=2, max_ttl=30, back_off_when_quiet=False)
+_STATUS_CHANGE_RATE = _ChangeRate(min_ttl=30, max_ttl=300)
+
+
+def _raise_for_status(r: UpstreamResponse, kind: str, name: str) -> None:
+    # TfL answers 400/404 for line ids it does not recognise
+    if r.status_code in (400, 404):
+        raise TFLNotFoundError(kind, name)
+    if r.status_code != 200:
+        raise TFLError(f"TfL returned HTTP {r.status_code} for {r.url}")
+
+
+async def healthcheck() -> TFLStatus:
     path = "/NetworkStatus"
-    r = requests.get(f"{TFL_ENDPOINT}{path}", headers=_HEADERS)
+    r = await _get(path)
     assert r.status_code == 200
     return TFLStatus.model_validate_json(r.text)
 
 
-@aio_cache_with_ttl(ttl=9999999)
+@aio_cache_with_ttl(
+    ttl=9999999, cache_errors=(TFLNotFoundError,), error_ttl=_NOT_FOUND_TTL
+)
 async def get_id(station_name: str) -> str:
     params = {
         "query": f"{station_name.title()} Underground Station",
         "modes": "tube",
     }
     path = "/StopPoint/Search"
-    # TODO make requests.get a promise
-    r = requests.get(f"{TFL_ENDPOINT}{path}", params=params, headers=_HEADERS)
-    assert r.status_code == 200
+    r = await _get(path, params)
+    _raise_for_status(r, "station", station_name)
     resp: dict[str, Any] = json.loads(r.text)
-    assert resp["total"] == 1
+    if resp["total"] != 1:
+        raise TFLNotFoundError("station", station_name)
     return resp["matches"][0]["id"]
 
 
-@aio_cache_with_ttl(ttl=2)
-async def get_arrivals(
+@aio_cache_with_ttl(
+    ttl=_fetched_ttl, cache_errors=(TFLNotFoundError,), error_ttl=_NOT_FOUND_TTL
+)
+async def fetch_arrivals(
     station_name: str,
     line: str,
     direction: Direction | None = None,
     destination_station: str | None = None,
-) -> list[TrainArrival]:
+) -> Fetched[ArrivalBoard]:
     if direction is None:
         direction = "all"
 
@@ -114,29 +299,33 @@ async def get_arrivals(
 
     station_id = await get_id(station_name)
     path = f"/Line/{line}/Arrivals/{station_id}"
-    r = requests.get(f"{TFL_ENDPOINT}{path}", params=params, headers=_HEADERS)
-    assert r.status_code == 200
-    ret = []
-    ta = TypeAdapter(list[_TFLArrival])
-    for arrival in ta.validate_json(r.text):
-        ret.append(
-            TrainArrival(
-                destination=arrival.destination_name,
-                time=arrival.time_to_station,
-                via=arrival.towards,
-            )
+    r = await _get(path, params)
+    _raise_for_status(r, "line", line)
+    with span("tfl.parse", path=path):
+        board = ArrivalBoard.from_rows(
+            (arrival.time_to_station, arrival.destination_name, arrival.towards)
+            for arrival in _ARRIVALS_ADAPTER.validate_json(r.text)
         )
-    return ret
+    ttl = _ARRIVALS_CHANGE_RATE.ttl(r.url, board.fingerprint(), _header_ttl(r.headers))
+    return Fetched(board, ttl)
 
 
-@aio_cache_with_ttl(ttl=30)
-async def get_line_status(
+@aio_cache_with_ttl(
+    ttl=_fetched_ttl, cache_errors=(TFLNotFoundError,), error_ttl=_NOT_FOUND_TTL
+)
+async def fetch_line_status(
     line: str,
-) -> LineStatusResponse:
+) -> Fetched[LineStatusResponse]:
     path = f"/Line/{line}/Status"
-    r = requests.get(f"{TFL_ENDPOINT}{path}", headers=_HEADERS)
-    assert r.status_code == 200
+    r = await _get(path)
+    _raise_for_status(r, "line", line)
 
-    json_resp = json.loads(r.text)
-    temp = _TFLLineStatus.model_validate(json_resp[0]["lineStatuses"][0])
-    return LineStatusResponse(status=temp.status, description=temp.reason)
+    with span("tfl.parse", path=path):
+        json_resp = json.loads(r.text)
+        if not json_resp:
+            raise TFLNotFoundError("line", line)
+        temp = _TFLLineStatus.model_validate(json_resp[0]["lineStatuses"][0])
+    ttl = _STATUS_CHANGE_RATE.ttl(
+        r.url, hash((temp.status, temp.reason)), _header_ttl(r.headers)
+    )
+    return Fetched(LineStatusResponse(status=temp.status, description=temp.reason), ttl)
@@ -0,0 +1,233 @@
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import TracebackType
+
+
+logger = logging.getLogger(__name__)
+
+
+AttributeValue = str | int | float | bool
+
+_STATUS_UNSET = 0
+_STATUS_ERROR = 2
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        return None
+
+    def set_attribute(self, key: str, value: AttributeValue) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    trace_id: int
+    span_id: int
+    parent_id: int | None
+    sampled: bool
+    attributes: dict[str, AttributeValue] = field(default_factory=dict)
+    start_ns: int = 0
+    end_ns: int = 0
+    status: int = _STATUS_UNSET
+    status_message: str = ""
+    _token: Token["Span | None"] | None = None
+
+    def set_attribute(self, key: str, value: AttributeValue) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.end_ns = time.time_ns()
+        if self._token is not None:
+            _current.reset(self._token)
+        if exc_type is not None:
+            self.status = _STATUS_ERROR
+            self.status_message = f"{exc_type.__name__}: {exc}"
+        if self.sampled and _tracer is not None:
+            _tracer.record(self)
+
+    def to_otlp(self) -> dict[str, object]:
+        otlp: dict[str, object] = {
+            "traceId": f"{self.trace_id:032x}",
+            "spanId": f"{self.span_id:016x}",
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": self.status, "message": self.status_message},
+        }
+        if self.parent_id is not None:
+            otlp["parentSpanId"] = f"{self.parent_id:016x}"
+        return otlp
+
+
+def _otlp_value(value: AttributeValue) -> dict[str, object]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": value}
+
+
+class Tracer:
+    """Samples root spans and writes finished ones as OTLP/JSON from a thread."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        sample_rate: float = 1.0,
+        batch_size: int = 128,
+        max_batches: int = 64,
+        service_name: str = "simple-tfl",
+    ) -> None:
+        self._path = path
+        self._sample_rate = sample_rate
+        self._batch_size = batch_size
+        self._resource = {
+            "attributes": [
+                {"key": "service.name", "value": {"stringValue": service_name}}
+            ]
+        }
+        self._pending: list[Span] = []
+        self._lock = threading.Lock()
+        # None tells the writer to exit
+        self._batches: queue.Queue[list[Span] | None] = queue.Queue(max_batches)
+        self._writer = threading.Thread(
+            target=self._run, name="trace-writer", daemon=True
+        )
+        self._writer.start()
+
+    def should_sample(self) -> bool:
+        return self._sample_rate >= 1.0 or random.random() < self._sample_rate
+
+    def record(self, span: Span) -> None:
+        with self._lock:
+            self._pending.append(span)
+            if len(self._pending) < self._batch_size:
+                return
+            batch, self._pending = self._pending, []
+        try:
+            self._batches.put_nowait(batch)
+        except queue.Full:
+            logger.warning("Trace writer is behind, dropped %d spans", len(batch))
+
+    def flush(self) -> None:
+        """Block until every finished span has been written."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._batches.put(batch)
+        self._batches.join()
+
+    def close(self) -> None:
+        self.flush()
+        self._batches.put(None)
+        self._writer.join()
+
+    def _run(self) -> None:
+        while (batch := self._batches.get()) is not None:
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception("Failed to write %d spans", len(batch))
+            finally:
+                self._batches.task_done()
+        self._batches.task_done()
+
+    def _write(self, batch: list[Span]) -> None:
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": self._resource,
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [span.to_otlp() for span in batch],
+                        }
+                    ],
+                }
+            ]
+        }
+        with self._path.open("a") as f:
+            f.write(json.dumps(request, separators=(",", ":")) + "\n")
+
+
+_current: ContextVar[Span | None] = ContextVar("current_span", default=None)
+_tracer: Tracer | None = None
+
+
+def configure_tracing(path: Path | None, *, sample_rate: float = 1.0) -> None:
+    """Enable tracing to `path`, or disable it when `path` is `None`."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = Tracer(path, sample_rate=sample_rate) if path is not None else None
+
+
+def flush_tracing() -> None:
+    if _tracer is not None:
+        _tracer.flush()
+
+
+def span(name: str, **attributes: AttributeValue) -> Span | _NoopSpan:
+    """Start a span under the current one; children inherit its sampling."""
+    if _tracer is None:
+        return _NOOP
+
+    parent = _current.get()
+    if parent is None:
+        sampled = _tracer.should_sample()
+        trace_id = random.getrandbits(128)
+        parent_id = None
+    else:
+        sampled = parent.sampled
+        trace_id = parent.trace_id
+        parent_id = parent.span_id
+
+    return Span(
+        name,
+        trace_id,
+        random.getrandbits(64),
+        parent_id,
+        sampled,
+        attributes if sampled else {},
+    )
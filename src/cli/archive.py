@@ -0,0 +1,114 @@
+import gzip
+import json
+import time
+from collections import deque
+from collections.abc import Iterator, Mapping
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Literal
+
+from src.backend._types import Direction
+from src.backend.tfl import Transport, UpstreamResponse
+
+
+@dataclass(slots=True, frozen=True)
+class Query:
+    kind: Literal["arrivals", "status"]
+    line: str
+    station: str | None = None
+    direction: Direction | None = None
+
+
+@dataclass(slots=True)
+class RecordedResponse:
+    status_code: int
+    url: str
+    text: str
+    headers: dict[str, str]
+
+
+def _request_key(url: str, params: Mapping[str, str] | None) -> str:
+    return json.dumps([url, sorted((params or {}).items())])
+
+
+class Recorder:
+    """Wraps a transport and appends every query and response to an archive."""
+
+    def __init__(self, path: Path, inner: Transport) -> None:
+        self._inner = inner
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._start = time.monotonic()
+        # responses arrive from transport worker threads
+        self._lock = Lock()
+
+    def _write(self, record: dict[str, object]) -> None:
+        record["t"] = round(time.monotonic() - self._start, 3)
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def query(self, query: Query) -> None:
+        self._write({"type": "query", **asdict(query)})
+
+    def __call__(self, url: str, params: Mapping[str, str] | None) -> UpstreamResponse:
+        r = self._inner(url, params)
+        self._write(
+            {
+                "type": "response",
+                "request_url": url,
+                "params": dict(params or {}),
+                "url": r.url,
+                "status_code": r.status_code,
+                "headers": dict(r.headers),
+                "text": r.text,
+            }
+        )
+        return r
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class Replayer:
+    """Serves recorded responses in recorded order, repeating each request's last."""
+
+    def __init__(self, path: Path) -> None:
+        self.queries: list[tuple[float, Query]] = []
+        self._responses: dict[str, deque[RecordedResponse]] = {}
+        for record in read_archive(path):
+            if record["type"] == "query":
+                self.queries.append(
+                    (
+                        record["t"],
+                        Query(
+                            record["kind"],
+                            record["line"],
+                            record["station"],
+                            record["direction"],
+                        ),
+                    )
+                )
+            else:
+                key = _request_key(record["request_url"], record["params"])
+                self._responses.setdefault(key, deque()).append(
+                    RecordedResponse(
+                        record["status_code"],
+                        record["url"],
+                        record["text"],
+                        record["headers"],
+                    )
+                )
+
+    def __call__(self, url: str, params: Mapping[str, str] | None) -> UpstreamResponse:
+        responses = self._responses.get(_request_key(url, params))
+        if not responses:
+            raise LookupError(f"No recorded response for {url} {params}")
+        return responses.popleft() if len(responses) > 1 else responses[0]
+
+
+def read_archive(path: Path) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
@@ -0,0 +1,223 @@
+"""Bulk TfL board queries, and offline record/replay of the raw responses."""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections.abc import Callable, Coroutine, Iterable, Sequence
+from pathlib import Path
+from typing import cast, get_args
+
+from src.backend import serialise, tfl
+from src.backend._types import Direction
+
+from .archive import Query, Recorder, Replayer
+
+
+def parse_arrivals(spec: str) -> Query:
+    """Parse `station/line[/direction]`."""
+    parts = spec.split("/")
+    if len(parts) not in (2, 3) or not all(parts):
+        raise argparse.ArgumentTypeError(
+            f"expected station/line[/direction], got {spec!r}"
+        )
+    direction = parts[2] if len(parts) == 3 else None
+    if direction is not None and direction not in get_args(Direction):
+        raise argparse.ArgumentTypeError(f"unknown direction {direction!r}")
+    return Query("arrivals", parts[1], parts[0], cast(Direction | None, direction))
+
+
+def parse_status(line: str) -> Query:
+    return Query("status", line)
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {value}")
+    return number
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    # also rejects nan, which compares false to everything
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {value}")
+    return number
+
+
+async def run_query(query: Query) -> dict[str, object]:
+    """Fetch one board as an NDJSON record, including the frame the backend sends."""
+    result: dict[str, object] = {
+        "kind": query.kind,
+        "station": query.station,
+        "line": query.line,
+        "direction": query.direction,
+    }
+    try:
+        if query.kind == "arrivals":
+            assert query.station is not None
+            arrivals = await tfl.fetch_arrivals(
+                query.station, query.line, query.direction
+            )
+            serialise.frame(arrivals, serialise.arrivals_frame)
+            result["arrivals"] = [m.model_dump() for m in arrivals.value.to_models()]
+        else:
+            status = await tfl.fetch_line_status(query.line)
+            serialise.frame(status, serialise.status_frame)
+            result["status"] = status.value.model_dump()
+    except tfl.TFLError as e:
+        result["error"] = str(e)
+    except Exception as e:
+        # a dropped connection or malformed body fails this board, not the run
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def _emit(result: dict[str, object]) -> None:
+    sys.stdout.write(json.dumps(result, separators=(",", ":")) + "\n")
+    sys.stdout.flush()
+
+
+async def query_all(
+    queries: Iterable[Query],
+    concurrency: int,
+    on_query: Callable[[Query], None] | None = None,
+) -> int:
+    """Run queries at most `concurrency` at a time, emitting each as it completes."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(query: Query) -> dict[str, object]:
+        async with semaphore:
+            if on_query is not None:
+                on_query(query)
+            return await run_query(query)
+
+    failed = 0
+    for done in asyncio.as_completed([bounded(q) for q in queries]):
+        result = await done
+        failed += "error" in result
+        _emit(result)
+    return failed
+
+
+async def record(
+    archive: Path,
+    queries: Sequence[Query],
+    *,
+    concurrency: int,
+    duration: float,
+    interval: float,
+    upstream: tfl.Transport | None = None,
+) -> int:
+    """Poll `queries` every `interval` seconds for `duration`, archiving responses."""
+    recorder = Recorder(archive, upstream or tfl.default_transport)
+    tfl.set_transport(recorder)
+    failed = 0
+    try:
+        deadline = time.monotonic() + duration
+        while True:
+            started = time.monotonic()
+            failed += await query_all(queries, concurrency, recorder.query)
+            if started + interval >= deadline:
+                break
+            await asyncio.sleep(max(0.0, started + interval - time.monotonic()))
+    finally:
+        tfl.set_transport(None)
+        recorder.close()
+    return failed
+
+
+async def replay(archive: Path, *, speed: float) -> int:
+    """Re-run recorded queries against recorded responses, `speed` times faster."""
+    replayer = Replayer(archive)
+    tfl.set_transport(replayer)
+    failed = 0
+    elapsed = 0.0
+    try:
+        start = time.monotonic()
+        for t, query in replayer.queries:
+            if speed != float("inf"):
+                await asyncio.sleep(max(0.0, start + t / speed - time.monotonic()))
+            tfl.fetch_arrivals.clear_cache()
+            tfl.fetch_line_status.clear_cache()
+            query_start = time.perf_counter()
+            result = await run_query(query)
+            elapsed += time.perf_counter() - query_start
+            failed += "error" in result
+            _emit(result)
+    finally:
+        tfl.set_transport(None)
+    count = len(replayer.queries)
+    print(
+        f"replayed {count} queries, {elapsed / max(count, 1) * 1e3:.3f}ms mean",
+        file=sys.stderr,
+    )
+    return failed
+
+
+def _add_query_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-a",
+        "--arrivals",
+        type=parse_arrivals,
+        action="append",
+        default=[],
+        metavar="STATION/LINE[/DIRECTION]",
+    )
+    parser.add_argument(
+        "-s",
+        "--status",
+        type=parse_status,
+        action="append",
+        default=[],
+        metavar="LINE",
+    )
+    parser.add_argument("-c", "--concurrency", type=positive_int, default=16)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m src.cli.main", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    _add_query_args(commands.add_parser("query", help="fetch boards once"))
+
+    rec = commands.add_parser("record", help="poll boards, archiving raw responses")
+    rec.add_argument("archive", type=Path)
+    _add_query_args(rec)
+    rec.add_argument("--duration", type=positive_float, default=60.0)
+    rec.add_argument("--interval", type=positive_float, default=5.0)
+
+    rep = commands.add_parser("replay", help="replay an archive without the network")
+    rep.add_argument("archive", type=Path)
+    rep.add_argument(
+        "--speed", type=positive_float, default=float("inf"), help="default: no delays"
+    )
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    run: Coroutine[None, None, int]
+    if args.command == "replay":
+        run = replay(args.archive, speed=args.speed)
+    else:
+        queries = args.arrivals + args.status
+        if not queries:
+            build_parser().error("no queries given, use --arrivals or --status")
+        if args.command == "query":
+            run = query_all(queries, args.concurrency)
+        else:
+            run = record(
+                args.archive,
+                queries,
+                concurrency=args.concurrency,
+                duration=args.duration,
+                interval=args.interval,
+            )
+    return 1 if asyncio.run(run) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+
+import pytest
+
+from src.backend import tfl
+from src.cli.archive import Query
+from src.cli.main import build_parser, parse_arrivals, query_all, record, replay
+from tests.fakes import FakeResponse, arrival, reset_tfl
+
+
+class Upstream:
+    """Fake TfL that counts in-flight requests and moves trains on each poll."""
+
+    def __init__(self) -> None:
+        self.polls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, url: str, params: Mapping[str, str] | None) -> FakeResponse:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.005)
+        try:
+            path = url.removeprefix(tfl.TFL_ENDPOINT)
+            if path == "/StopPoint/Search":
+                station = (params or {})["query"].split()[0]
+                return FakeResponse({"total": 1, "matches": [{"id": station}]})
+            if path.startswith("/Line/bogus/"):
+                return FakeResponse({}, status_code=404)
+            if path.endswith("/Broken"):
+                raise ConnectionError("connection reset")
+            self.polls += 1
+            return FakeResponse(
+                [arrival(300 - 30 * self.polls, "Brixton")],
+                headers={"Cache-Control": "max-age=0"},
+                url=url,
+            )
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def upstream() -> Iterator[Upstream]:
+    fake = Upstream()
+    tfl.set_transport(fake)
+    yield fake
+    reset_tfl()
+
+
+def _lines(out: str) -> list[dict]:
+    return [json.loads(line) for line in out.splitlines()]
+
+
+def test_parse_arrivals() -> None:
+    assert parse_arrivals("green park/jubilee/inbound") == Query(
+        "arrivals", "jubilee", "green park", "inbound"
+    )
+    assert parse_arrivals("brixton/victoria").direction is None
+    for bad in ("brixton", "brixton/victoria/up", "/victoria"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_arrivals(bad)
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["query", "-s", "victoria", "--concurrency", "0"],
+        ["record", "a.gz", "-s", "victoria", "--interval", "-1"],
+        ["replay", "a.gz", "--speed", "0"],
+        ["replay", "a.gz", "--speed", "nan"],
+    ],
+)
+def test_parser_rejects_non_positive_numbers(argv: list[str]) -> None:
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(argv)
+
+
+def test_query_all_bounds_concurrency_and_reports_errors(
+    upstream: Upstream, capsys: pytest.CaptureFixture[str]
+) -> None:
+    queries = [parse_arrivals(f"station{i}/victoria") for i in range(8)]
+    queries.append(parse_arrivals("brixton/bogus"))
+
+    failed = asyncio.run(query_all(queries, concurrency=2))
+
+    assert failed == 1
+    assert upstream.max_in_flight <= 2
+    results = _lines(capsys.readouterr().out)
+    assert len(results) == 9
+    (error,) = [r for r in results if "error" in r]
+    assert error["error"] == "Unknown line: 'bogus'"
+
+
+def test_query_all_reports_transport_failures_per_query(
+    upstream: Upstream, capsys: pytest.CaptureFixture[str]
+) -> None:
+    queries = [parse_arrivals(f"{s}/victoria") for s in ("a", "b", "broken", "c")]
+
+    failed = asyncio.run(query_all(queries, concurrency=4))
+
+    assert failed == 1
+    results = _lines(capsys.readouterr().out)
+    assert sorted(r["station"] for r in results if "arrivals" in r) == ["a", "b", "c"]
+    (error,) = [r for r in results if "error" in r]
+    assert error["error"] == "ConnectionError: connection reset"
+    assert upstream.polls == 3
+
+
+def test_record_then_replay_without_network(
+    upstream: Upstream, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    archive = tmp_path / "boards.ndjson.gz"
+    queries = [parse_arrivals("brixton/victoria")]
+
+    asyncio.run(
+        record(
+            archive,
+            queries,
+            concurrency=4,
+            duration=0.05,
+            interval=0.02,
+            upstream=upstream,
+        )
+    )
+    recorded = _lines(capsys.readouterr().out)
+    assert len(recorded) >= 2
+
+    reset_tfl()
+    asyncio.run(replay(archive, speed=float("inf")))
+
+    captured = capsys.readouterr()
+    assert _lines(captured.out) == recorded
+    assert captured.err.startswith(f"replayed {len(recorded)} queries")
@@ -0,0 +1,65 @@
+"""Fake TfL data and helpers shared by the server and CLI tests."""
+
+import json
+from dataclasses import dataclass, field
+
+from src.backend import tfl
+
+
+DESTINATIONS = [
+    "Walthamstow Central Underground Station",
+    "Brixton Underground Station",
+    "Seven Sisters Underground Station",
+]
+VIAS = ["Check Front of Train", "Brixton", "Walthamstow Central"]
+
+
+@dataclass
+class FakeResponse:
+    body: object
+    headers: dict[str, str] = field(default_factory=dict)
+    status_code: int = 200
+    url: str = ""
+
+    @property
+    def text(self) -> str:
+        return json.dumps(self.body)
+
+
+def arrival(time: int, destination: str) -> dict[str, object]:
+    return {
+        "id": "1",
+        "operationType": 1,
+        "vehicleId": "v",
+        "naptanId": "n",
+        "stationName": "s",
+        "lineId": "victoria",
+        "lineName": "Victoria",
+        "platformName": "p",
+        "direction": "inbound",
+        "bearing": "",
+        "destinationNaptanId": "d",
+        "destinationName": destination,
+        "timestamp": "t",
+        "timeToStation": time,
+        "currentLocation": "",
+        "towards": "Check Front of Train",
+        "expectedArrival": "t",
+        "timeToLive": "t",
+        "modeName": "tube",
+        "timing": {
+            "countdownServerAdjustment": "",
+            "source": "",
+            "insert": "",
+            "read": "",
+            "sent": "",
+            "received": "",
+        },
+    }
+
+
+def reset_tfl() -> None:
+    """Restore the real transport and drop anything cached from the fakes."""
+    tfl.set_transport(None)
+    for f in (tfl.get_id, tfl.fetch_arrivals, tfl.fetch_line_status):
+        f.clear_cache()
@@ -0,0 +1,177 @@
+from collections.abc import Iterator, Mapping
+
+import pytest
+from fastapi.testclient import TestClient
+from freezegun import freeze_time
+from freezegun.api import FrozenDateTimeFactory
+from starlette.status import WS_1008_POLICY_VIOLATION
+from starlette.websockets import WebSocketDisconnect
+
+from src.backend import main, tfl
+from src.backend._types import LineStatusResponse
+from src.backend.serialise import status_frame
+from tests.fakes import FakeResponse, arrival, reset_tfl
+
+
+@pytest.fixture
+def frozen() -> Iterator[FrozenDateTimeFactory]:
+    with freeze_time("2024-01-01") as frozen:
+        assert isinstance(frozen, FrozenDateTimeFactory)
+        yield frozen
+
+
+@pytest.fixture
+def upstream(frozen: FrozenDateTimeFactory) -> Iterator[list[str]]:
+    calls: list[str] = []
+
+    def transport(url: str, params: Mapping[str, str] | None) -> FakeResponse:
+        path = url.removeprefix(tfl.TFL_ENDPOINT)
+        calls.append(path)
+        if path.startswith("/Line/slow/"):
+            frozen.tick(10)
+        if path == "/StopPoint/Search":
+            if params and params["query"].startswith("Nowhere"):
+                return FakeResponse({"total": 0, "matches": []})
+            return FakeResponse({"total": 1, "matches": [{"id": "940GZZLUBXN"}]})
+        if path.startswith("/Line/bogus/"):
+            return FakeResponse({"message": "not recognised"}, status_code=404)
+        if path.endswith("/Status"):
+            return FakeResponse(
+                [{"lineStatuses": [{"statusSeverityDescription": "Good Service"}]}],
+                headers={"Cache-Control": "max-age=60"},
+                url=url,
+            )
+        return FakeResponse([arrival(120, "Brixton")], url=url)
+
+    tfl.set_transport(transport)
+    yield calls
+    reset_tfl()
+
+
+def test_arrivals_snapshot(upstream: list[str]) -> None:
+    client = TestClient(main.app)
+
+    resp = client.get("/api/arrivals/brixton/victoria/inbound")
+    assert resp.status_code == 200
+    assert resp.json() == [
+        {"time": 120, "destination": "Brixton", "via": "Check Front of Train"}
+    ]
+    assert resp.headers["cache-control"] == "public, max-age=2"
+    assert upstream == ["/StopPoint/Search", "/Line/victoria/Arrivals/940GZZLUBXN"]
+
+    etag = resp.headers["etag"]
+    resp = client.get(
+        "/api/arrivals/brixton/victoria/inbound", headers={"If-None-Match": etag}
+    )
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+    assert len(upstream) == 2
+
+
+def test_status_snapshot(upstream: list[str]) -> None:
+    client = TestClient(main.app)
+
+    resp = client.get("/api/status/victoria")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "Good Service", "description": ""}
+    assert resp.headers["cache-control"] == "public, max-age=30"
+
+    resp = client.get("/api/status/victoria", headers={"If-None-Match": 'W/"x"'})
+    assert resp.status_code == 200
+    assert upstream == ["/Line/victoria/Status"]
+
+
+def test_any_etag_matches_wildcard(upstream: list[str]) -> None:
+    client = TestClient(main.app)
+
+    resp = client.get("/api/status/victoria", headers={"If-None-Match": "*"})
+    assert resp.status_code == 304
+    assert "etag" in resp.headers
+    assert upstream == ["/Line/victoria/Status"]
+
+
+def test_max_age_counts_from_the_upstream_request(
+    upstream: list[str], frozen: FrozenDateTimeFactory
+) -> None:
+    client = TestClient(main.app)
+
+    # the 30s TTL started when the 10s upstream call did
+    assert client.get("/api/status/slow").headers["cache-control"] == (
+        "public, max-age=20"
+    )
+    frozen.tick(5)
+    assert client.get("/api/status/slow").headers["cache-control"] == (
+        "public, max-age=15"
+    )
+    assert upstream == ["/Line/slow/Status"]
+
+
+def test_invalid_direction_is_rejected(upstream: list[str]) -> None:
+    client = TestClient(main.app)
+
+    assert client.get("/api/arrivals/brixton/victoria/sideways").status_code == 422
+    assert upstream == []
+
+
+def test_unknown_station_is_negatively_cached(upstream: list[str]) -> None:
+    client = TestClient(main.app)
+
+    for _ in range(3):
+        resp = client.get("/api/arrivals/nowhere/victoria")
+        assert resp.status_code == 404
+        assert resp.json() == {"detail": "Unknown station: 'nowhere'"}
+    assert upstream == ["/StopPoint/Search"]
+
+
+def test_unknown_line_is_negatively_cached(upstream: list[str]) -> None:
+    client = TestClient(main.app)
+
+    for _ in range(3):
+        assert client.get("/api/status/bogus").status_code == 404
+    assert upstream == ["/Line/bogus/Status"]
+
+
+def test_websockets_share_one_serialised_frame(
+    upstream: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    serialised: list[LineStatusResponse] = []
+
+    def counting_frame(status: LineStatusResponse) -> str:
+        serialised.append(status)
+        return status_frame(status)
+
+    monkeypatch.setattr(main, "status_frame", counting_frame)
+    client = TestClient(main.app)
+
+    with (
+        client.websocket_connect("/ws/status/victoria") as a,
+        client.websocket_connect("/ws/status/victoria") as b,
+    ):
+        assert a.receive_text() == b.receive_text()
+    assert len(serialised) == 1
+    assert upstream == ["/Line/victoria/Status"]
+
+
+@pytest.mark.parametrize(
+    ("path", "reason", "calls"),
+    [
+        (
+            "/ws/arrivals/nowhere/victoria",
+            "Unknown station: 'nowhere'",
+            ["/StopPoint/Search"],
+        ),
+        ("/ws/status/bogus", "Unknown line: 'bogus'", ["/Line/bogus/Status"]),
+    ],
+)
+def test_websocket_closes_on_unknown_name(
+    upstream: list[str], path: str, reason: str, calls: list[str]
+) -> None:
+    client = TestClient(main.app)
+
+    for _ in range(3):
+        with client.websocket_connect(path) as ws:
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_text()
+        assert closed.value.code == WS_1008_POLICY_VIOLATION
+        assert closed.value.reason == reason
+    assert upstream == calls
@@ -1,10 +1,11 @@
+import asyncio
 import datetime
 import inspect
 
 import pytest
 from freezegun import freeze_time
 
-from src.backend.cache import aio_cache_with_ttl
+from src.backend.cache import CachedAsyncFunction, aio_cache_with_ttl
 
 
 @pytest.mark.asyncio
@@ -206,3 +207,121 @@ async def test_function_kwargs_async() -> None:
         # different kwargs leads to new computation
         assert await f(1, x=4, y=3) == 8
         assert counter == 2
+
+
+@pytest.mark.asyncio
+async def test_per_result_ttl_async() -> None:
+    counter = 0
+
+    @aio_cache_with_ttl(ttl=lambda result: result)
+    async def f(ttl: int) -> int:
+        nonlocal counter
+        counter += 1
+        return ttl
+
+    initial_datetime = datetime.datetime(year=2023, month=1, day=1)
+    with freeze_time(initial_datetime) as frozen:
+        await f(1)
+        await f(5)
+        assert counter == 2
+        assert list(f.ttls().values()) == [1, 5]
+
+        frozen.tick(delta=2)
+        await f(1)
+        assert counter == 3
+        await f(5)
+        assert counter == 3
+
+
+@pytest.mark.asyncio
+async def test_cached_errors_expire_after_error_ttl_async() -> None:
+    counter = 0
+
+    @aio_cache_with_ttl(ttl=100, cache_errors=(KeyError,), error_ttl=1)
+    async def f(key: str) -> int:
+        nonlocal counter
+        counter += 1
+        if key == "bad":
+            raise KeyError(key)
+        if key == "worse":
+            raise ValueError(key)
+        return 1
+
+    initial_datetime = datetime.datetime(year=2023, month=2, day=2)
+    with freeze_time(initial_datetime) as frozen:
+        for _ in range(3):
+            with pytest.raises(KeyError):
+                await f("bad")
+        assert counter == 1
+
+        # errors not listed in cache_errors are never cached
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await f("worse")
+        assert counter == 3
+
+        frozen.tick(delta=2)
+        with pytest.raises(KeyError):
+            await f("bad")
+        assert counter == 4
+
+
+@pytest.mark.asyncio
+async def test_cached_errors_are_bounded_and_keep_no_traceback() -> None:
+    f = CachedAsyncFunction(
+        _unknown, ttl=100, cache_errors=(KeyError,), error_ttl=10, max_errors=100
+    )
+
+    initial_datetime = datetime.datetime(year=2023, month=2, day=2)
+    with freeze_time(initial_datetime) as frozen:
+        for i in range(2000):
+            with pytest.raises(KeyError):
+                await f(f"bogus{i}")
+        assert len(f.ttls()) == 100
+
+        # a fresh instance is raised, so no frames of the failed call are kept
+        with pytest.raises(KeyError) as first:
+            await f("bogus1999")
+        with pytest.raises(KeyError) as second:
+            await f("bogus1999")
+        assert first.value is not second.value
+        assert first.value.args == ("bogus1999",)
+
+        # expired errors are swept on the next insert
+        frozen.tick(delta=11)
+        with pytest.raises(KeyError):
+            await f("late")
+        assert len(f.ttls()) == 1
+
+
+async def _unknown(key: str) -> int:
+    raise KeyError(key)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_call() -> None:
+    counter = 0
+    release = asyncio.Event()
+
+    @aio_cache_with_ttl(ttl=10, cache_errors=(KeyError,), error_ttl=10)
+    async def f(key: str) -> int:
+        nonlocal counter
+        counter += 1
+        await release.wait()
+        if key == "bad":
+            raise KeyError(key)
+        return counter
+
+    good = [asyncio.create_task(f("good")) for _ in range(20)]
+    bad = [asyncio.create_task(f("bad")) for _ in range(5)]
+    await asyncio.sleep(0)
+    # the first caller giving up does not cancel the call for everyone else
+    good[0].cancel()
+    release.set()
+
+    assert await asyncio.gather(*good[1:]) == [1] * 19
+    for task in bad:
+        with pytest.raises(KeyError):
+            await task
+    assert counter == 2
+    assert await f("good") == 1
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections.abc import Iterator, Mapping
+
+import pytest
+import uvicorn
+from websockets.frames import OP_TEXT, Frame
+from websockets.sync.client import connect
+
+from src.backend import main, tfl
+from src.backend._types import ArrivalBoard
+from src.backend.compression import DeflateWebSocketProtocol, deflate_factory
+from src.backend.serialise import arrivals_frame
+from tests.fakes import DESTINATIONS, VIAS, FakeResponse, reset_tfl
+
+
+@pytest.fixture
+def server() -> Iterator[int]:
+    def transport(url: str, _params: Mapping[str, str] | None) -> FakeResponse:
+        return FakeResponse(
+            [{"lineStatuses": [{"statusSeverityDescription": "Good Service"}]}],
+            url=url,
+        )
+
+    tfl.set_transport(transport)
+    server = uvicorn.Server(
+        uvicorn.Config(
+            main.app,
+            port=0,
+            ws=DeflateWebSocketProtocol,
+            lifespan="off",
+            log_level="warning",
+        )
+    )
+    thread = threading.Thread(target=server.run)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield server.servers[0].sockets[0].getsockname()[1]
+    # don't wait out the socket handlers' sleep between ticks
+    server.should_exit = server.force_exit = True
+    thread.join()
+    reset_tfl()
+
+
+def _ticks(count: int) -> list[bytes]:
+    """Consecutive frames of a typical 24-train board counting down between ticks."""
+    return [
+        arrivals_frame(
+            ArrivalBoard.from_rows(
+                (max(0, 60 * i - 2 * tick), DESTINATIONS[i % 3], VIAS[i % 3])
+                for i in range(24)
+            )
+        ).encode()
+        for tick in range(count)
+    ]
+
+
+def _compressed_ratio(context_takeover: bool) -> float:
+    _, extension = deflate_factory(
+        context_takeover=context_takeover
+    ).process_request_params([], [])
+    frames = _ticks(30)
+    compressed = sum(len(extension.encode(Frame(OP_TEXT, f)).data) for f in frames)
+    return compressed / sum(len(f) for f in frames)
+
+
+def test_negotiates_tuned_window_bits() -> None:
+    response, _ = deflate_factory(window_bits=10).process_request_params([], [])
+
+    assert ("server_max_window_bits", "10") in response
+
+
+def test_context_takeover_compresses_repeated_boards() -> None:
+    # ~2.1KB per tick compresses to ~100B with takeover and ~230B without
+    assert _compressed_ratio(context_takeover=True) < 0.08
+    assert _compressed_ratio(context_takeover=False) < 0.15
+
+
+def test_small_frames_are_sent_uncompressed() -> None:
+    _, extension = deflate_factory(min_size=128).process_request_params([], [])
+
+    small = extension.encode(Frame(OP_TEXT, b'{"status":"Good Service"}'))
+    assert not small.rsv1
+    assert small.data == b'{"status":"Good Service"}'
+
+    large = extension.encode(Frame(OP_TEXT, _ticks(1)[0]))
+    assert large.rsv1
+
+
+def test_uvicorn_negotiates_tuned_deflate(server: int) -> None:
+    with connect(f"ws://127.0.0.1:{server}/ws/status/victoria") as ws:
+        assert ws.response is not None
+        extensions = ws.response.headers["Sec-WebSocket-Extensions"]
+        assert ws.recv() == '{"status":"Good Service","description":""}'
+
+    # uvicorn's own factory would also answer client_max_window_bits=12
+    assert extensions == "permessage-deflate; server_max_window_bits=12"
@@ -0,0 +1,116 @@
+import datetime
+
+import pytest
+from freezegun import freeze_time
+
+from src.backend.cache import DecayingCounter, aio_cache_with_ttl
+from src.backend.prefetch import Prefetcher
+
+
+def test_counter_scores_decay_by_half_life() -> None:
+    counter: DecayingCounter[str, None] = DecayingCounter(half_life=10)
+    for _ in range(4):
+        counter.add("a", None, now=0)
+    counter.add("b", None, now=10)
+
+    (a, _, score_a), (b, _, score_b) = counter.top(2, now=10)
+    assert (a, b) == ("a", "b")
+    assert score_a == pytest.approx(2)
+    assert score_b == pytest.approx(1)
+
+    counter.add("b", None, now=20)
+    assert [key for key, _, _ in counter.top(2, now=20)] == ["b", "a"]
+
+
+def test_counter_prunes_cold_keys() -> None:
+    counter: DecayingCounter[int, None] = DecayingCounter(half_life=10, max_keys=4)
+    for key in range(4):
+        for _ in range(key + 1):
+            counter.add(key, None, now=0)
+    counter.add(4, None, now=0)
+
+    assert len(counter) == 2
+    assert [key for key, _, _ in counter.top(5, now=0)] == [3, 2]
+
+
+@pytest.mark.asyncio
+async def test_refresh_recomputes_without_counting_access() -> None:
+    counter = 0
+
+    @aio_cache_with_ttl(ttl=10)
+    async def f(a: int, b: int = 1) -> int:
+        nonlocal counter
+        counter += 1
+        return a + b + counter
+
+    with freeze_time(datetime.datetime(year=2024, month=1, day=1)):
+        assert await f(1) == 3
+        ((key, score),) = f.popular(1)
+
+        await f.refresh(key)
+        assert counter == 2
+        assert await f(1) == 4
+        assert f.popular(1)[0][1] == pytest.approx(score + 1)
+
+
+@pytest.mark.asyncio
+async def test_prefetcher_refreshes_hottest_expiring_keys_within_budget() -> None:
+    calls: list[str] = []
+
+    @aio_cache_with_ttl(ttl=2)
+    async def board(station: str) -> str:
+        calls.append(station)
+        return station
+
+    prefetcher = Prefetcher([board], top_k=10, interval=1, rate=2, min_score=0)
+
+    with freeze_time(datetime.datetime(year=2024, month=1, day=1)) as frozen:
+        for station, hits in (("cold", 1), ("warm", 2), ("hot", 3)):
+            for _ in range(hits):
+                await board(station)
+        calls.clear()
+
+        # nothing expires before the next pass yet
+        assert await prefetcher.tick() == 0
+
+        frozen.tick(delta=1.5)
+        assert await prefetcher.tick() == 2
+        assert calls == ["hot", "warm"]
+
+        calls.clear()
+        assert await board("hot") == "hot"
+        assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_prefetcher_lets_idle_and_failing_keys_go() -> None:
+    calls: list[str] = []
+
+    @aio_cache_with_ttl(ttl=60, cache_errors=(KeyError,), error_ttl=60)
+    async def board(station: str) -> str:
+        calls.append(station)
+        if station == "bogus":
+            raise KeyError(station)
+        return station
+
+    prefetcher = Prefetcher([board], top_k=10, interval=60, rate=1, min_score=1.5)
+
+    with freeze_time(datetime.datetime(year=2024, month=1, day=1)) as frozen:
+        for station in ("once", "twice", "twice", "bogus", "bogus"):
+            try:
+                await board(station)
+            except KeyError:
+                pass
+        calls.clear()
+
+        # six idle hours, one pass a minute
+        for _ in range(6 * 60):
+            frozen.tick(delta=60)
+            await prefetcher.tick()
+        assert board.popular(10, min_score=1.5) == []
+
+    # "twice" is kept warm until its score decays below 1.5 (~6 minutes),
+    # "once" never qualifies and "bogus" is dropped after its first failed refresh
+    assert calls.count("once") == 0
+    assert 1 <= calls.count("twice") <= 7
+    assert calls.count("bogus") <= 1
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.backend import main
+from src.backend.profiling import Profiler, SlowCallbackDetector
+
+
+def _busy_wait(seconds: float) -> None:
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def test_profiler_collapses_sampled_stacks() -> None:
+    profiler = Profiler(threading.get_ident(), interval=0.001)
+    profiler.start()
+    _busy_wait(0.2)
+    output = profiler.stop()
+
+    stack, count = output.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.endswith(f"{__name__}:_busy_wait")
+    assert f"{__name__}:test_profiler_collapses_sampled_stacks;" in stack
+
+
+@pytest.mark.asyncio
+async def test_slow_callback_detector_logs_blocking_stack(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    detector = SlowCallbackDetector(threshold=0.05)
+    detector.start()
+    try:
+        await asyncio.sleep(0.05)
+        with caplog.at_level(logging.WARNING):
+            time.sleep(0.3)
+            await asyncio.sleep(0)
+    finally:
+        detector.stop()
+
+    assert len(caplog.records) == 1
+    assert "Event loop blocked" in caplog.text
+    assert "test_slow_callback_detector_logs_blocking_stack" in caplog.text
+
+
+def test_admin_endpoints_require_token(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = TestClient(main.app)
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    assert client.get("/api/admin/profile?seconds=0.01").status_code == 403
+
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "wrong"}
+    assert client.get("/api/admin/profile", headers=headers).status_code == 403
+
+    headers = {"X-Admin-Token": "secret"}
+    resp = client.get("/api/admin/profile?seconds=0.05", headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+
+
+def test_cache_ttls_is_admin_only(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = TestClient(main.app)
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+
+    assert client.get("/api/cache/ttls").status_code == 404
+    assert client.get("/api/admin/cache/ttls").status_code == 403
+    resp = client.get("/api/admin/cache/ttls", headers={"X-Admin-Token": "secret"})
+    assert resp.json() == {"fetch_arrivals": {}, "fetch_line_status": {}}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_profile_stops_profiler() -> None:
+    task = asyncio.create_task(main.profile(seconds=10, interval=0.001))
+    await asyncio.sleep(0.01)
+    assert main._profiler is not None and main._profiler.running
+
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert not main._profiler.running
+    # a later profile can start again instead of answering 409
+    assert isinstance(await main.profile(seconds=0.01, interval=0.001), str)
@@ -0,0 +1,19 @@
+import gc
+
+from src.backend._types import LineStatusResponse
+from src.backend.serialise import _SERIALISED, body, frame, status_frame, status_json
+from src.backend.tfl import Fetched
+
+
+def test_serialised_forms_are_cached_and_dropped_with_the_result() -> None:
+    before = len(_SERIALISED)
+    fetched = Fetched(LineStatusResponse(status="Good Service", description=""), 5)
+
+    assert frame(fetched, status_frame) is frame(fetched, status_frame)
+    content, etag = body(fetched, status_json)
+    assert body(fetched, status_json) == (content, etag)
+    assert len(_SERIALISED) == before + 1
+
+    del fetched
+    gc.collect()
+    assert len(_SERIALISED) == before
@@ -0,0 +1,83 @@
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+
+ROOT = Path(__file__).parents[3]
+
+# `import src.backend.main` measured ~0.38s (best of 3), against ~0.46s before the
+# lazy imports. The budget leaves ~18% for noise and stays below the old time; the
+# LAZY_MODULES check is what pins the individual deferred imports.
+IMPORT_BUDGET_S = 0.45
+IMPORT_RUNS = 3
+HEALTHY_BUDGET_S = 5.0
+
+# Only needed once the first upstream call / CV sync happens, not to go healthy.
+LAZY_MODULES = ("requests", "httpx", "dotenv")
+
+
+def _import_times(module: str) -> dict[str, int]:
+    """Return cumulative import time in microseconds per module via -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_import_within_budget() -> None:
+    runs = [_import_times("src.backend.main") for _ in range(IMPORT_RUNS)]
+    times = runs[0]
+
+    best = min(run["src.backend.main"] for run in runs) / 1e6
+    assert best < IMPORT_BUDGET_S
+    for module in LAZY_MODULES:
+        assert module not in times, f"{module} imported at startup"
+
+
+def test_healthy_within_budget() -> None:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "src.backend.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+    )
+    try:
+        while (elapsed := time.perf_counter() - start) < HEALTHY_BUDGET_S:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health") as r:
+                    if r.status == 200:
+                        break
+            except OSError:
+                time.sleep(0.05)
+        assert elapsed < HEALTHY_BUDGET_S
+    finally:
+        proc.terminate()
+        proc.wait()
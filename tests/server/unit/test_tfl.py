@@ -0,0 +1,84 @@
+import datetime
+
+from freezegun import freeze_time
+
+from src.backend.tfl import TFLNotFoundError, _ChangeRate, _header_ttl
+
+
+def test_header_ttl_from_max_age_minus_age() -> None:
+    assert _header_ttl({"Cache-Control": "public, max-age=30", "Age": "12"}) == 18
+    assert _header_ttl({"Cache-Control": "max-age=30, s-maxage=60"}) == 60
+    assert _header_ttl({"Cache-Control": "max-age=5", "Age": "10"}) == 0
+
+
+def test_header_ttl_from_expires() -> None:
+    headers = {
+        "Expires": "Wed, 21 Oct 2015 07:28:30 GMT",
+        "Date": "Wed, 21 Oct 2015 07:28:00 GMT",
+    }
+    assert _header_ttl(headers) == 30
+
+
+def test_header_ttl_without_hints() -> None:
+    assert _header_ttl({}) is None
+    assert _header_ttl({"Cache-Control": "no-cache"}) == 0
+    assert _header_ttl({"Cache-Control": "max-age=abc"}) == 0
+
+
+def test_change_rate_backs_off_for_unchanged_content() -> None:
+    rate = _ChangeRate(min_ttl=2, max_ttl=30)
+
+    with freeze_time(datetime.datetime(year=2024, month=1, day=1)) as frozen:
+        assert rate.ttl("k", 1, None) == 2
+        frozen.tick(delta=20)
+        assert rate.ttl("k", 1, None) == 10
+        frozen.tick(delta=100)
+        assert rate.ttl("k", 1, None) == 30
+        # upstream headers cap the estimate
+        assert rate.ttl("k", 1, 7) == 7
+
+
+def test_change_rate_stays_low_for_changing_content() -> None:
+    rate = _ChangeRate(min_ttl=2, max_ttl=30)
+
+    with freeze_time(datetime.datetime(year=2024, month=1, day=1)) as frozen:
+        for fingerprint in range(10):
+            assert rate.ttl("k", fingerprint, None) == 2
+            frozen.tick(delta=3)
+
+
+def test_arrivals_change_rate_never_outlives_upstream_freshness() -> None:
+    rate = _ChangeRate(min_ttl=2, max_ttl=30, back_off_when_quiet=False)
+
+    with freeze_time(datetime.datetime(year=2024, month=1, day=1)) as frozen:
+        assert rate.ttl("k", 1, 60) == 2
+        # a long quiet spell is not evidence that countdowns are still accurate
+        frozen.tick(delta=120)
+        assert rate.ttl("k", 1, None) == 2
+        assert rate.ttl("k", 1, 60) == 2
+        # once the board changes, half the observed interval applies within headers
+        for fingerprint in range(2, 5):
+            frozen.tick(delta=20)
+            ttl = rate.ttl("k", fingerprint, 60)
+        assert 2 < ttl <= 30
+        assert rate.ttl("k", 4, 4) == 4
+        assert rate.ttl("k", 4, None) == 2
+
+
+def test_not_found_error_rebuilds_from_args() -> None:
+    error = TFLNotFoundError("station", "Nowhere")
+    rebuilt = type(error)(*error.args)
+    assert str(rebuilt) == str(error) == "Unknown station: 'Nowhere'"
+    assert (rebuilt.kind, rebuilt.name) == ("station", "Nowhere")
+
+
+def test_header_ttl_survives_malformed_headers() -> None:
+    assert _header_ttl({"Cache-Control": "max-age=30", "Age": "soon"}) == 0
+    assert _header_ttl({"Cache-Control": "max-age=30", "Age": ""}) == 0
+    assert _header_ttl({"Expires": "garbage", "Date": "garbage"}) == 0
+    # RFC 5322 allows -0000 for UTC, which parses as a naive datetime
+    headers = {
+        "Expires": "Wed, 21 Oct 2015 07:28:30 -0000",
+        "Date": "Wed, 21 Oct 2015 07:28:00 GMT",
+    }
+    assert _header_ttl(headers) == 30
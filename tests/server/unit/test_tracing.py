@@ -0,0 +1,112 @@
+import json
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from src.backend.cache import aio_cache_with_ttl
+from src.backend.tracing import Span, Tracer, configure_tracing, flush_tracing, span
+
+
+@pytest.fixture
+def trace_file(tmp_path: Path) -> Iterator[Path]:
+    path = tmp_path / "spans.jsonl"
+    configure_tracing(path)
+    yield path
+    configure_tracing(None)
+
+
+def _spans(path: Path) -> list[dict]:
+    flush_tracing()
+    if not path.exists():
+        return []
+    return [
+        s
+        for line in path.read_text().splitlines()
+        for rs in json.loads(line)["resourceSpans"]
+        for ss in rs["scopeSpans"]
+        for s in ss["spans"]
+    ]
+
+
+def test_disabled_span_is_shared_noop() -> None:
+    configure_tracing(None)
+    assert span("a") is span("b", key="value")
+
+
+def test_spans_nest_and_export_otlp(trace_file: Path) -> None:
+    with span("parent", line="victoria"):
+        with span("child") as child:
+            child.set_attribute("count", 3)
+
+    child_span, parent_span = _spans(trace_file)
+    assert parent_span["name"] == "parent"
+    assert "parentSpanId" not in parent_span
+    assert parent_span["attributes"] == [
+        {"key": "line", "value": {"stringValue": "victoria"}}
+    ]
+    assert child_span["traceId"] == parent_span["traceId"]
+    assert child_span["parentSpanId"] == parent_span["spanId"]
+    assert child_span["attributes"] == [{"key": "count", "value": {"intValue": "3"}}]
+
+
+def test_exception_marks_span_as_error(trace_file: Path) -> None:
+    with pytest.raises(ValueError), span("boom"):
+        raise ValueError("bad")
+
+    (s,) = _spans(trace_file)
+    assert s["status"] == {"code": 2, "message": "ValueError: bad"}
+
+
+def test_unsampled_trace_records_nothing(tmp_path: Path) -> None:
+    path = tmp_path / "spans.jsonl"
+    configure_tracing(path, sample_rate=0.0)
+    try:
+        with span("root"), span("child"):
+            pass
+        assert _spans(path) == []
+    finally:
+        configure_tracing(None)
+
+
+@pytest.mark.asyncio
+async def test_cache_lookup_records_result(trace_file: Path) -> None:
+    @aio_cache_with_ttl(ttl=10)
+    async def f() -> int:
+        return 1
+
+    await f()
+    await f()
+
+    results = [
+        attr["value"]["stringValue"]
+        for s in _spans(trace_file)
+        for attr in s["attributes"]
+        if attr["key"] == "cache.result"
+    ]
+    assert results == ["miss", "hit"]
+
+
+def test_full_batches_are_written_off_the_calling_thread(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> None:
+    writers: list[str] = []
+    write = Tracer._write
+
+    def tracking_write(self: Tracer, batch: list[Span]) -> None:
+        writers.append(threading.current_thread().name)
+        write(self, batch)
+
+    monkeypatch.setattr(Tracer, "_write", tracking_write)
+    path = tmp_path / "spans.jsonl"
+    configure_tracing(path)
+    try:
+        for _ in range(200):
+            with span("tick"):
+                pass
+        assert len(_spans(path)) == 200
+    finally:
+        configure_tracing(None)
+    assert writers
+    assert threading.current_thread().name not in writers
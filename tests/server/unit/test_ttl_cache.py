@@ -1,5 +1,6 @@
 import datetime
 
+import pytest
 from freezegun import freeze_time
 
 from src.backend.cache import cache_with_ttl
@@ -197,3 +198,25 @@ def test_function_kwargs() -> None:
         # different kwargs leads to new computation
         assert f(1, x=4, y=3) == 8
         assert counter == 2
+
+
+def test_cached_errors_expire_after_error_ttl() -> None:
+    counter = 0
+
+    @cache_with_ttl(ttl=100, cache_errors=(KeyError,), error_ttl=1)
+    def f() -> int:
+        nonlocal counter
+        counter += 1
+        raise KeyError("missing")
+
+    initial_datetime = datetime.datetime(year=2023, month=2, day=2)
+    with freeze_time(initial_datetime) as frozen:
+        for _ in range(3):
+            with pytest.raises(KeyError):
+                f()
+        assert counter == 1
+
+        frozen.tick(delta=2)
+        with pytest.raises(KeyError):
+            f()
+        assert counter == 2
@@ -0,0 +1,52 @@
+import gc
+import json
+import tracemalloc
+from collections.abc import Callable
+
+from src.backend._types import ArrivalBoard, TrainArrival
+from tests.fakes import DESTINATIONS, VIAS
+
+
+# one typical board's rows, as JSON so each parse yields fresh str objects
+ROWS = [json.dumps([60 * i, DESTINATIONS[i % 3], VIAS[i % 3]]) for i in range(24)]
+
+
+def _bytes_per_board(build: Callable[[list[tuple[int, str, str]]], object]) -> float:
+    boards = 500
+    gc.collect()
+    tracemalloc.start()
+    kept = [build([tuple(json.loads(row)) for row in ROWS]) for _ in range(boards)]
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(kept) == boards
+    return size / boards
+
+
+def test_board_round_trips_to_models() -> None:
+    rows = [(30, "Brixton", "Victoria"), (90, "Walthamstow", "Check Front of Train")]
+    board = ArrivalBoard.from_rows(rows)
+
+    assert len(board) == 2
+    assert board.to_models() == [
+        TrainArrival(time=30, destination="Brixton", via="Victoria"),
+        TrainArrival(time=90, destination="Walthamstow", via="Check Front of Train"),
+    ]
+
+
+def test_board_interns_strings() -> None:
+    a = ArrivalBoard.from_rows([(1, "".join(["Brix", "ton"]), "x")])
+    b = ArrivalBoard.from_rows([(1, "".join(["Brix", "ton"]), "x")])
+
+    assert a.destinations[0] is b.destinations[0]
+    assert a.fingerprint() == b.fingerprint()
+
+
+def test_board_memory_is_smaller_than_models() -> None:
+    models = _bytes_per_board(
+        lambda rows: [TrainArrival(time=t, destination=d, via=v) for t, d, v in rows]
+    )
+    board = _bytes_per_board(ArrivalBoard.from_rows)
+
+    # ~15KB vs ~0.8KB per 24-arrival board when measured
+    assert board * 4 < models